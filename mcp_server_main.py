@@ -2,7 +2,7 @@ import json
 import urllib.request
 from datetime import datetime
 from fastmcp import FastMCP
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel
 from word_processor.enums import FormattingType, MarginType
 
@@ -32,6 +32,10 @@ class FindResult(BaseModel):
     locations: List[tuple[int, int]]
 
 
+class FindManyResult(BaseModel):
+    locations: Dict[str, List[tuple[int, int]]]
+
+
 class MessageResponse(BaseModel):
     message: str
 
@@ -213,6 +217,45 @@ def find(search_term: str) -> FindResult:
         return None
 
 
+@mcp.tool
+def find_many(search_terms: List[str]) -> FindManyResult:
+    """
+    Searches the entire document for several search terms at once and returns all occurrences of each.
+
+    Returns a 'FindManyResult' object which contains:
+    - 'locations': A mapping from each search term to a list of tuples, where each tuple contains the 'start_index' and 'end_index' of a match.
+
+    Prefer this over calling 'find' repeatedly when you need the positions of several different words before an edit.
+
+    Args:
+        search_terms: The texts to search for in the document.
+    """
+    print(
+        f"{datetime.now()} - Calling method: find_many with parameters search_terms: {search_terms}",
+        flush=True,
+    )
+
+    req = urllib.request.Request(
+        f"{EDITOR_API_URL}/document/find_many",
+        data=json.dumps({"search_terms": search_terms}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(req) as response:
+            if response.status == 200:
+                response_data = json.loads(response.read().decode())
+                output = FindManyResult(**response_data)
+                print(f"Output: {output}", flush=True)
+                return output
+            else:
+                print(f"Error: Received status {response.status}")
+                return None
+    except Exception as e:
+        print(f"Error finding texts: {e}")
+        return None
+
+
 @mcp.tool
 def delete_substring(start_index: int, end_index: int) -> MessageResponse:
     """
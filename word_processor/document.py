@@ -1,60 +1,139 @@
-import json
+import asyncio
+import bisect
 import os
-from typing import List
-from pydantic import BaseModel, ConfigDict
+from operator import attrgetter
+import orjson
+from typing import Dict, List, Optional
+from pydantic import BaseModel, ConfigDict, TypeAdapter
+from .gap_buffer import GapBuffer
 from .paragraph import Paragraph
 from .enums import FormattingType, MarginType
 
+try:
+    import ahocorasick
+except ImportError:  # optional: find_many falls back to one scan per term
+    ahocorasick = None
+
+# Validates saved JSON straight into the in-memory dataclasses.
+_PARAGRAPHS_ADAPTER = TypeAdapter(List[Paragraph])
+_START_INDEX = attrgetter("start_index")
+_MARGIN_FIELDS = {
+    MarginType.LEFT: "margin_left",
+    MarginType.RIGHT: "margin_right",
+    MarginType.TOP: "margin_top",
+    MarginType.BOTTOM: "margin_bottom",
+}
+
+
+def _write_file(saves_dir: str, file_path: str, data: bytes):
+    os.makedirs(saves_dir, exist_ok=True)
+    with open(file_path, "wb") as f:
+        f.write(data)
+
+
+def _read_file(file_path: str) -> Optional[bytes]:
+    try:
+        with open(file_path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
 
 class Document(BaseModel):
+    # next_paragraph_id is bumped for every new paragraph and margins are set
+    # via setattr, so assignments must stay unvalidated.
+    model_config = ConfigDict(validate_assignment=False, extra="ignore")
+
     margin_left: float = 2.5
     margin_right: float = 2.5
     margin_top: float = 2.5
     margin_bottom: float = 2.5
     next_paragraph_id: int = 1
-    _content: List[Paragraph] = []
-    _content.append(Paragraph(content="", paragraph_id=0))
+    _content: GapBuffer[Paragraph] = GapBuffer([Paragraph(content="", paragraph_id=0)])
+    # paragraph_id -> position in _content, rebuilt by recalculate_start_and_end.
+    # The default matches the initial single paragraph above.
+    _id_index: Dict[int, int] = {0: 0}
+    # Bumped by every edit; anything derived from the document can be cached
+    # against it (see the version property).
+    _version: int = 0
+    # Concatenated paragraph text, valid while _text_version == _version.
+    _text_cache: str = ""
+    _text_version: int = -1
+    # True while no two neighbouring paragraphs could be merged. Edits that
+    # only change text can't create a mergeable pair, so they skip the merge
+    # scan entirely; only load leaves the document uncompacted.
+    _compacted: bool = True
+
+    @property
+    def version(self) -> int:
+        """Edit counter that changes whenever the document does."""
+        return self._version
+
+    def _touch(self, text_changed: bool = True):
+        # Called once an edit is fully applied, so anything cached under the
+        # new version reflects the finished edit. Pass text_changed=False
+        # only from edits that cannot touch paragraph content (margins), so
+        # an up-to-date text cache stays valid.
+        if not text_changed and self._text_version == self._version:
+            self._text_version += 1
+        self._version += 1
 
     def _get_paragraph_by_id(self, paragraph_id: int) -> tuple[int, Paragraph]:
-        for i, p in enumerate(self._content):
-            if p.paragraph_id == paragraph_id:
-                return i, p
-        raise ValueError(f"Paragraph with id {paragraph_id} not found")
+        i = self._id_index.get(paragraph_id)
+        if i is None:
+            raise ValueError(f"Paragraph with id {paragraph_id} not found")
+        return i, self._content[i]
 
     def create_paragraph(self, **kwargs) -> Paragraph:
+        # Callers pass values copied from existing paragraphs, which have
+        # already been validated, so no schema walk is needed.
         par = Paragraph(paragraph_id=self.next_paragraph_id, **kwargs)
         self.next_paragraph_id += 1
         return par
 
     def get_text_only(self) -> str:
-        result: str
-        result = "".join(so.content for so in self._content)
-        return result
-
-    def save(self, filename: str, saves_dir: str):
-        os.makedirs(saves_dir, exist_ok=True)
+        version = self._version
+        if self._text_version != version:
+            self._text_cache = "".join(so.content for so in self._content)
+            self._text_version = version
+        return self._text_cache
+
+    async def save(self, filename: str, saves_dir: str):
+        # Serialize on the caller's thread so the snapshot is consistent; only
+        # the disk write runs in a worker thread.
+        # orjson serializes the slotted Paragraph dataclasses directly
+        # (skipping the underscore-prefixed render cache fields).
         file_path = os.path.join(saves_dir, filename)
-        with open(file_path, "w") as f:
-            json.dump([paragraph.model_dump() for paragraph in self._content], f, indent=4)
+        data = orjson.dumps(list(self._content), option=orjson.OPT_INDENT_2)
+        await asyncio.to_thread(_write_file, saves_dir, file_path, data)
 
-    def load(self, filename: str, saves_dir: str):
+    async def load(self, filename: str, saves_dir: str):
         file_path = os.path.join(saves_dir, filename)
-        if not os.path.exists(file_path):
+        data = await asyncio.to_thread(_read_file, file_path)
+        if data is None:
             raise FileNotFoundError(f"File '{filename}' not found in '{saves_dir}'")
-        with open(file_path, "r") as f:
-            loaded_content = json.load(f)
-            self._content = [Paragraph(**item) for item in loaded_content]
+        # pydantic-core parses and validates in one pass, building the
+        # Paragraph dataclasses without an intermediate list of dicts.
+        self._content = GapBuffer(_PARAGRAPHS_ADAPTER.validate_json(data))
+        self._compacted = False
+        self.recalculate_start_and_end()
+        self._touch()
 
     def to_html(self) -> str:
-        html_parts = []
-        html_parts.append("<style>h1, h2, h3, p { display: inline; }</style>")
+        return self.to_html_bytes().decode("utf-8")
+
+    def to_html_bytes(self) -> bytes:
+        # Every fragment goes into one list that is joined once, so the
+        # paragraphs' cached bytes are copied a single time.
+        parts = [b"<style>h1, h2, h3, p { display: inline; }</style>"]
 
         if self._content:
-            main_content = "".join(so.to_html() for so in self._content)
             style = f"padding-top: {self.margin_top}cm; padding-bottom: {self.margin_bottom}cm; padding-left: {self.margin_left}cm; padding-right: {self.margin_right}cm;"
-            html_parts.append(f'<main style="{style}">{main_content}</main>')
+            parts.append(f'\n<main style="{style}">'.encode("utf-8"))
+            parts.extend(so.to_html_bytes() for so in self._content)
+            parts.append(b"</main>")
 
-        return "\n".join(html_parts)
+        return b"".join(parts)
 
     def insert_at_index(self, text: str, index: int):
         """Inserts text at a specific index in the document."""
@@ -62,16 +141,21 @@ class Document(BaseModel):
             self._content.append(Paragraph(content="", paragraph_id=0))
 
         target_paragraph = None
-        for p in self._content:
-            # The '+1' allows insertion at the very end of a paragraph's content
-            if p.start_index <= index <= p.end_index + 1:
-                target_paragraph = p
-                break
+        # The first paragraph whose span (plus one, which allows insertion at
+        # the very end of its content) contains the index is the one just
+        # before the first paragraph starting at or after it.
+        target_position = max(
+            bisect.bisect_left(self._content, index, key=_START_INDEX) - 1, 0
+        )
+        p = self._content[target_position]
+        if p.start_index <= index <= p.end_index + 1:
+            target_paragraph = p
 
         if target_paragraph is None:
             # If index is out of bounds, default to the last paragraph
             if self._content:
-                target_paragraph = self._content[-1]
+                target_position = len(self._content) - 1
+                target_paragraph = self._content[target_position]
                 # And insert at the end of it.
                 index = target_paragraph.end_index + 1
             else:
@@ -82,11 +166,15 @@ class Document(BaseModel):
         insertion_point = index - target_paragraph.start_index
 
         # Perform the insertion on the paragraph
+        old_length = len(target_paragraph.content)
         target_paragraph.insert(text, insertion_point)
 
-        # Consolidate and re-index the document
-        self.join_paragraphs()
-        self.recalculate_start_and_end()
+        # Only this paragraph changed length, so shift the offsets from here on
+        # instead of re-indexing the whole document.
+        self._shift_offsets(target_position, old_length)
+        if not self._compacted:
+            self.join_paragraphs()
+        self._touch()
 
     def find_in_body(
         self, text: str, start_index: int = 0, end_index: int = -1
@@ -99,33 +187,54 @@ class Document(BaseModel):
         if end_index == -1:
             end_index = len(full_text)
 
+        # str.find already runs the substring search in C; keep the per-match
+        # Python work down to a bound-method call and a tuple append.
         locations = []
+        append = locations.append
+        find = full_text.find
+        last_offset = len(text) - 1
         current_pos = start_index
         while current_pos < end_index:
-            found_pos = full_text.find(text, current_pos, end_index)
+            found_pos = find(text, current_pos, end_index)
             if found_pos == -1:
                 break
-            locations.append((found_pos, found_pos + len(text) - 1))
+            append((found_pos, found_pos + last_offset))
             current_pos = found_pos + 1
 
         return locations
 
+    def find_many(self, texts: List[str]) -> Dict[str, List[tuple[int, int]]]:
+        """Finds every occurrence of several search terms at once.
+
+        With pyahocorasick installed the text is scanned a single time for all
+        terms; otherwise each term is searched with find_in_body.
+        """
+        locations: Dict[str, List[tuple[int, int]]] = {text: [] for text in texts}
+        needles = [text for text in locations if text]
+        if not needles:
+            return locations
+
+        if ahocorasick is None:
+            for text in needles:
+                locations[text] = self.find_in_body(text)
+            return locations
+
+        automaton = ahocorasick.Automaton()
+        for text in needles:
+            automaton.add_word(text, text)
+        automaton.make_automaton()
+        for end, text in automaton.iter(self.get_text_only()):
+            locations[text].append((end - len(text) + 1, end))
+        return locations
+
     def delete(self, start_index: int, end_index: int):
         if start_index > end_index:
             return
 
-        start_p = None
-        end_p = None
-        start_p_index = -1
-        end_p_index = -1
-
-        for i, p in enumerate(self._content):
-            if p.start_index <= start_index <= p.end_index + 1:
-                start_p = p
-                start_p_index = i
-            if p.start_index <= end_index <= p.end_index + 1:
-                end_p = p
-                end_p_index = i
+        start_p_index = self._last_position_at(start_index, end_offset=1)
+        end_p_index = self._last_position_at(end_index, end_offset=1)
+        start_p = self._content[start_p_index] if start_p_index != -1 else None
+        end_p = self._content[end_p_index] if end_p_index != -1 else None
 
         if start_p is None:
             return
@@ -138,102 +247,170 @@ class Document(BaseModel):
         relative_end = end_index - end_p.start_index
 
         if start_p is end_p:
-            start_p.content = (
+            old_length = len(start_p.content)
+            start_p.set_content(
                 start_p.content[:relative_start] + start_p.content[relative_end + 1 :]
             )
+            self._shift_offsets(start_p_index, old_length)
+            if not self._compacted:
+                self.join_paragraphs()
         else:
-            start_p.content = start_p.content[:relative_start]
-            end_p.content = end_p.content[relative_end + 1 :]
+            start_p.set_content(start_p.content[:relative_start])
+            end_p.set_content(end_p.content[relative_end + 1 :])
 
             if start_p_index + 1 < end_p_index:
                 del self._content[start_p_index + 1 : end_p_index]
 
-        self.join_paragraphs()
-        self.recalculate_start_and_end()
+            if not self.join_paragraphs():
+                self.recalculate_start_and_end()
+        self._touch()
 
     def switch_formatting(
         self, start_index: int, end_index: int, formatting_type: FormattingType
     ):
-        copy_content = self._content.copy()
-        for p in copy_content:
-            if (
-                p.start_index <= start_index <= p.end_index
-                or p.end_index >= end_index >= p.start_index
-            ):
-                self.switch_style_within_paragraph(
-                    p,
-                    max(start_index, p.start_index),
-                    min(end_index, p.end_index),
-                    formatting_type,
+        # A reversed range selects nothing; splitting on it would duplicate
+        # the text between the two ends.
+        if start_index > end_index:
+            return
+
+        # Look up the paragraphs holding the selection's ends, then split them
+        # by position. Each split may insert paragraphs before the next
+        # target, so the pending positions are shifted by the growth.
+        targets = sorted(
+            {
+                i
+                for i in (
+                    self._last_position_at(start_index),
+                    self._last_position_at(end_index),
                 )
-        self.join_paragraphs()
-        self.recalculate_start_and_end()
+                if i != -1
+            }
+        )
+        shift = 0
+        for i in targets:
+            index = i + shift
+            p = self._content[index]
+            size_before = len(self._content)
+            self.switch_style_within_paragraph(
+                p,
+                max(start_index, p.start_index),
+                min(end_index, p.end_index),
+                formatting_type,
+                index=index,
+            )
+            shift += len(self._content) - size_before
+        if not self.join_paragraphs():
+            self.recalculate_start_and_end()
+        # Formatting splits rewrite paragraph content, so the text cache is
+        # rebuilt rather than trusted to be unchanged.
+        self._touch()
 
     def switch_style_within_paragraph(
-        self, p, start_index: int, end_index: int, formatting_type: FormattingType
+        self,
+        p,
+        start_index: int,
+        end_index: int,
+        formatting_type: FormattingType,
+        index: Optional[int] = None,
     ):
-        index = self._content.index(p)
-        p_start = self.create_paragraph(
-            content=p.content[: max(start_index - p.start_index, 0)],
-            bold=p.bold,
-            italic=p.italic,
-            lowerscript=p.lowerscript,
-            superscript=p.superscript,
-            hierarchy=p.hierarchy,
-        )
-        if p_start.content != "":
-            self._content.insert(index, p_start)
+        if index is None:
+            index = self._content.index(p)
+        # Only split off pieces that have content, so no paragraph (or id) is
+        # created just to be thrown away.
+        content = p.content
+        head_end = max(start_index - p.start_index, 0)
+        tail_start = len(content) - max(p.end_index - end_index, 0)
+        pre = content[:head_end]
+        if pre:
+            self._content.insert(index, self._clone_with_content(p, pre))
             index += 1
 
-        p_end = self.create_paragraph(
-            content=p.content[len(p.content) - max(p.end_index - end_index, 0) :],
+        post = content[tail_start:]
+        if post:
+            self._content.insert(index + 1, self._clone_with_content(p, post))
+        p.set_content(content[head_end:tail_start])
+        p.switch_formatting(formatting_type)
+
+    def _clone_with_content(self, p: Paragraph, content: str) -> Paragraph:
+        """Creates a new paragraph with p's formatting and the given content."""
+        return self.create_paragraph(
+            content=content,
             bold=p.bold,
             italic=p.italic,
             lowerscript=p.lowerscript,
             superscript=p.superscript,
             hierarchy=p.hierarchy,
         )
-        if p_end.content != "":
-            self._content.insert(index + 1, p_end)
-        p.content = p.content[
-            max(start_index - p.start_index, 0) : len(p.content)
-            - max(p.end_index - end_index, 0)
-        ]
-        p.switch_formatting(formatting_type.value)
 
     def get_content(self) -> List[Paragraph]:
-        return self._content
+        return self._content.copy()
 
-    def join_paragraphs(self):
-        if not self._content:
-            return
+    def to_json_bytes(self) -> bytes:
+        return orjson.dumps(self._content.copy())
 
-        i = len(self._content) - 1
-        while i > 0:
-            current_paragraph = self._content[i]
-            previous_paragraph = self._content[i - 1]
+    def join_paragraphs(self) -> bool:
+        """Merges neighbouring paragraphs with identical formatting.
 
-            if previous_paragraph.can_merge_with(current_paragraph):
-                previous_paragraph.merge(current_paragraph)
-                del self._content[i]
-
-            i -= 1
-        self.recalculate_start_and_end()
+        Re-indexes the document and returns True only if anything was merged.
+        """
+        if not self._content:
+            return False
+
+        self._compacted = True
+        # Single left-to-right sweep: each paragraph either merges into the
+        # last kept one or is kept itself, so nothing is deleted mid-list.
+        kept: List[Paragraph] = []
+        merged = False
+        for paragraph in self._content:
+            if kept and kept[-1].can_merge_with(paragraph):
+                kept[-1].merge(paragraph)
+                merged = True
+            else:
+                kept.append(paragraph)
+
+        if merged:
+            self._content = GapBuffer(kept)
+            self.recalculate_start_and_end()
+        return merged
+
+    def _last_position_at(self, index: int, end_offset: int = 0) -> int:
+        """Returns the position of the last paragraph whose span contains
+        `index`, with its end extended by `end_offset`, or -1 if none does."""
+        i = bisect.bisect_right(self._content, index, key=_START_INDEX) - 1
+        if i >= 0 and index <= self._content[i].end_index + end_offset:
+            return i
+        return -1
+
+    def _shift_offsets(self, position: int, old_length: int):
+        """Updates offsets after the paragraph at `position` changed length.
+
+        Moves its end, and every paragraph after it, by the change in length.
+        Falls back to a full re-index if its offsets didn't match `old_length`
+        (e.g. the initial empty paragraph before the first edit).
+        """
+        p = self._content[position]
+        if p.end_index - p.start_index + 1 != old_length:
+            self.recalculate_start_and_end()
+            return
+        delta = len(p.content) - old_length
+        if not delta:
+            return
+        p.end_index += delta
+        for following in self._content.iter_from(position + 1):
+            following.start_index += delta
+            following.end_index += delta
 
     def recalculate_start_and_end(self):
         start_index: int = 0
-        for so in self._content:
+        id_index: Dict[int, int] = {}
+        for i, so in enumerate(self._content):
+            length = len(so.content)
             so.start_index = start_index
-            so.end_index = so.start_index + len(so.content) - 1
-            start_index += len(so.content)
+            so.end_index = start_index + length - 1
+            start_index += length
+            id_index.setdefault(so.paragraph_id, i)
+        self._id_index = id_index
 
     def set_margin(self, margin_type: MarginType, value_mm: int):
-        value_cm = value_mm / 10.0
-        if margin_type == MarginType.LEFT:
-            self.margin_left = value_cm
-        elif margin_type == MarginType.RIGHT:
-            self.margin_right = value_cm
-        elif margin_type == MarginType.TOP:
-            self.margin_top = value_cm
-        elif margin_type == MarginType.BOTTOM:
-            self.margin_bottom = value_cm
+        setattr(self, _MARGIN_FIELDS[margin_type], value_mm / 10.0)
+        self._touch(text_changed=False)
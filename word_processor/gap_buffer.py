@@ -0,0 +1,118 @@
+from itertools import islice
+from typing import Generic, Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+
+class GapBuffer(Generic[T]):
+    """A list-like sequence stored as two stacks around a movable gap.
+
+    Items before the gap live in `left`, items after it in `right` (reversed),
+    so edits near the last edit position don't shift the rest of the sequence.
+    """
+
+    __slots__ = ("left", "right")
+
+    def __init__(self, items: Iterable[T] = ()):
+        self.left: List[T] = list(items)
+        self.right: List[T] = []
+
+    def _move_gap(self, index: int):
+        left, right = self.left, self.right
+        while len(left) > index:
+            right.append(left.pop())
+        while len(left) < index and right:
+            left.append(right.pop())
+
+    def _normalize(self, index: int) -> int:
+        size = len(self)
+        if index < 0:
+            index += size
+        return min(max(index, 0), size)
+
+    def insert(self, index: int, item: T):
+        self._move_gap(self._normalize(index))
+        self.left.append(item)
+
+    def append(self, item: T):
+        self._move_gap(len(self))
+        self.left.append(item)
+
+    def delete(self, index: int):
+        size = len(self)
+        if index < 0:
+            index += size
+        if not 0 <= index < size:
+            raise IndexError("GapBuffer index out of range")
+        self._move_gap(index + 1)
+        self.left.pop()
+
+    def index(self, item: T) -> int:
+        for i, x in enumerate(self):
+            if x is item or x == item:
+                return i
+        raise ValueError(f"{item!r} is not in GapBuffer")
+
+    def iter_from(self, start: int) -> Iterator[T]:
+        """Iterates over the items from position `start` to the end."""
+        left = self.left
+        if start < len(left):
+            yield from islice(left, max(start, 0), None)
+            yield from reversed(self.right)
+        else:
+            right = self.right
+            yield from islice(reversed(right), start - len(left), None)
+
+    def copy(self) -> List[T]:
+        return list(self)
+
+    def __delitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                raise ValueError("GapBuffer only supports contiguous slice deletion")
+            if start >= stop:
+                return
+            self._move_gap(stop)
+            del self.left[start:]
+        else:
+            self.delete(key)
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return list(self)[key]
+        size = len(self)
+        if key < 0:
+            key += size
+        if not 0 <= key < size:
+            raise IndexError("GapBuffer index out of range")
+        n_left = len(self.left)
+        if key < n_left:
+            return self.left[key]
+        return self.right[size - 1 - key]
+
+    def __setitem__(self, key: int, item: T):
+        size = len(self)
+        if key < 0:
+            key += size
+        if not 0 <= key < size:
+            raise IndexError("GapBuffer index out of range")
+        n_left = len(self.left)
+        if key < n_left:
+            self.left[key] = item
+        else:
+            self.right[size - 1 - key] = item
+
+    def __len__(self) -> int:
+        return len(self.left) + len(self.right)
+
+    def __iter__(self) -> Iterator[T]:
+        yield from self.left
+        yield from reversed(self.right)
+
+    def __reversed__(self) -> Iterator[T]:
+        yield from self.right
+        yield from reversed(self.left)
+
+    def __repr__(self) -> str:
+        return f"GapBuffer({list(self)!r})"
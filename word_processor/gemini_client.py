@@ -2,31 +2,51 @@ import os
 from fastmcp import Client
 
 from dotenv import load_dotenv
-from typing import Any, Dict, List
+from typing import Any, AsyncIterator, Dict, List
 import logging
 from google.genai import types
 from google import genai
 
-# Configure logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format="%(asctime)s - %(message)s",
-    filename="logfile.txt",
-    filemode="w",
+log = logging.getLogger(__name__)
+
+
+def configure_logging():
+    """Sets up the app's root logging: everything to logfile.txt, INFO and
+    above to the console.
+
+    Called by the server at startup rather than at import, so importing this
+    module doesn't take over the root logger. Does nothing if the root logger
+    already has handlers.
+    """
+    if logging.getLogger().handlers:
+        return
+    logging.basicConfig(
+        level=logging.DEBUG,
+        format="%(asctime)s - %(message)s",
+        filename="logfile.txt",
+        filemode="w",
+    )
+
+    # Console handler to show only INFO and above
+    console = logging.StreamHandler()
+    console.setLevel(logging.INFO)
+    # Use a simpler format for the console
+    console_formatter = logging.Formatter("%(message)s")
+    console.setFormatter(console_formatter)
+    logging.getLogger("").addHandler(console)
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+    logging.getLogger("fastmcp").setLevel(logging.ERROR)
+    logging.getLogger("google.genai").setLevel(logging.ERROR)
+
+
+SERVER_ERROR_REPLY = (
+    "Agent: I encountered an error communicating with the Gemini API. "
+    "This might be due to a very large input. Please try a shorter "
+    "input or rephrase your request."
 )
-
-# Console handler to show only INFO and above
-console = logging.StreamHandler()
-console.setLevel(logging.INFO)
-# Use a simpler format for the console
-console_formatter = logging.Formatter("%(message)s")
-console.setFormatter(console_formatter)
-logging.getLogger("").addHandler(console)
-
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("httpcore").setLevel(logging.WARNING)
-logging.getLogger("fastmcp").setLevel(logging.ERROR)
-logging.getLogger("google.genai").setLevel(logging.ERROR)
+UNEXPECTED_ERROR_REPLY = "Agent: An unexpected error occurred. Please try again."
 
 class GeminiAgentClient:
     def __init__(
@@ -110,58 +130,45 @@ class GeminiAgentClient:
                 prev_msg = messages[i - 1] if i > 0 else None
                 gemini_contents.append(self._handle_tool_message(msg, prev_msg))
             else:
-                logging.warning(f"Unknown role: {role}")
+                log.warning("Unknown role: %s", role)
         return gemini_contents
 
-    async def _chat_with_llm(self, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
-        logging.debug("--- Sending to Gemini ---")
+    def _generate_content_config(self) -> types.GenerateContentConfig:
+        # Must be called inside `async with self.client`, which opens the
+        # MCP session the tools run on.
+        return types.GenerateContentConfig(
+            tools=[self.client.session],
+            automatic_function_calling=types.AutomaticFunctionCallingConfig(
+                maximum_remote_calls=20
+            ),
+            system_instruction=self.system_prompt,
+        )
+
+    async def _chat_with_llm_stream(
+        self, messages: List[Dict[str, Any]]
+    ) -> AsyncIterator[str]:
+        """Yields the reply's text as Gemini produces it.
+
+        Tool calls still run automatically in between; only the text parts are
+        yielded. Errors are reported as a final text chunk.
+        """
+        log.debug("--- Streaming from Gemini ---")
         gemini_contents = self._convert_messages_to_gemini_content(messages)
 
         try:
             async with self.client:
-                response = await self.gemini_client.aio.models.generate_content(
+                stream = await self.gemini_client.aio.models.generate_content_stream(
                     model=self.gemini_model,
                     contents=gemini_contents,
-                    config=types.GenerateContentConfig(
-                        tools=[self.client.session],
-                        automatic_function_calling=types.AutomaticFunctionCallingConfig(
-                            maximum_remote_calls=20
-                        ),
-                        system_instruction=self.system_prompt,
-                    ),
+                    config=self._generate_content_config(),
                 )
-                full_response_content = response.text
-                tool_calls_from_gemini = []
-
-                if response.function_calls:
-                    for fc in response.function_calls:
-                        tool_calls_from_gemini.append(
-                            {"function": {"name": fc.name, "arguments": fc.args}}
-                        )
-
-                gemini_response = {
-                    "message": {"role": "assistant", "content": full_response_content}
-                }
-                if tool_calls_from_gemini:
-                    gemini_response["message"]["tool_calls"] = tool_calls_from_gemini
-
-                return gemini_response
+                async for chunk in stream:
+                    if chunk.text:
+                        yield chunk.text
 
         except genai.errors.ServerError as e:
-            logging.error(f"Error communicating with Gemini API: {e}", exc_info=True)
-            return {
-                "message": {
-                    "role": "assistant",
-                    "content": "Agent: I encountered an error communicating with the Gemini API. "
-                    "This might be due to a very large input. Please try a shorter "
-                    "input or rephrase your request.",
-                }
-            }
+            log.error("Error communicating with Gemini API: %s", e, exc_info=True)
+            yield SERVER_ERROR_REPLY
         except Exception as e:
-            logging.error(f"An unexpected error occurred: {e}", exc_info=True)
-            return {
-                "message": {
-                    "role": "assistant",
-                    "content": "Agent: An unexpected error occurred. Please try again.",
-                }
-            }
+            log.error("An unexpected error occurred: %s", e, exc_info=True)
+            yield UNEXPECTED_ERROR_REPLY
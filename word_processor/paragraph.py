@@ -1,16 +1,62 @@
-from pydantic import BaseModel, field_serializer
-from typing import Optional, List
+from dataclasses import dataclass, field
+from pydantic import Field
+from pydantic.json_schema import SkipJsonSchema
+from typing import Annotated, Optional
 import html
 import re
-import logging
 from word_processor.enums import FormattingType
 
-logging.basicConfig(
-    filename="paragraph_log.txt", level=logging.INFO, format="%(asctime)s - %(message)s"
-)
+_NEWLINES_RE = re.compile(r"\n+")
 
+# Inline formatting tags from innermost to outermost, indexed by bit position
+# in Paragraph.format_mask.
+_INLINE_TAGS = ("b", "i", "sub", "sup")
+# Block tag wrapped around the inline tags for each hierarchy level.
+_HIERARCHY_TAGS = {
+    FormattingType.TITLE: "h1",
+    FormattingType.HEADING: "h2",
+    FormattingType.SUBHEADING: "h3",
+}
+
+
+def _tag_pair(mask: int, block_tag: Optional[str]) -> tuple[str, str]:
+    tags = [tag for bit, tag in enumerate(_INLINE_TAGS) if mask & (1 << bit)]
+    if block_tag:
+        tags.append(block_tag)
+    open_tags = "".join(f"<{tag}>" for tag in reversed(tags))
+    close_tags = "".join(f"</{tag}>" for tag in tags)
+    return open_tags, close_tags
+
+
+# FormattingType -> the boolean flag it toggles. Any other type sets the
+# paragraph's hierarchy instead.
+_TOGGLED_FLAGS = {
+    FormattingType.BOLD: "bold",
+    FormattingType.ITALIC: "italic",
+    FormattingType.LOWERSCRIPT: "lowerscript",
+    FormattingType.SUPERSCRIPT: "superscript",
+}
+
+
+# Combined open/close tags per (hierarchy, inline formatting mask), so a
+# paragraph is wrapped in all of its tags with a single concatenation.
+_TAG_PAIRS = {
+    (hierarchy, mask): _tag_pair(mask, _HIERARCHY_TAGS.get(hierarchy))
+    for hierarchy in FormattingType
+    for mask in range(1 << len(_INLINE_TAGS))
+}
+
+
+@dataclass(slots=True, kw_only=True)
+class Paragraph:
+    """A run of text sharing one set of formatting.
+
+    A plain slotted dataclass, so the edit/render loops don't pay Pydantic's
+    construction and attribute overhead. Validation happens only at the API
+    and file boundary, through TypeAdapters in document.py. Fields are
+    keyword-only so content can stay required after the defaulted offsets.
+    """
 
-class Paragraph(BaseModel):
     paragraph_id: int
     start_index: int = 0
     end_index: int = 0
@@ -20,49 +66,61 @@ class Paragraph(BaseModel):
     lowerscript: bool = False
     superscript: bool = False
     hierarchy: FormattingType = FormattingType.BODY
+    # Encoded to_html() output, cleared by every method that changes the
+    # content or formatting. Assign content through set_content() for the
+    # same reason. Render and edit on the same thread: a render racing an
+    # edit could store stale bytes after the edit cleared them.
+    _html_bytes: SkipJsonSchema[Annotated[Optional[bytes], Field(exclude=True)]] = field(
+        default=None, init=False, repr=False, compare=False
+    )
+
+    @property
+    def format_mask(self) -> int:
+        return (
+            self.bold
+            | self.italic << 1
+            | self.lowerscript << 2
+            | self.superscript << 3
+        )
 
-    @field_serializer('hierarchy')
-    def serialize_hierarchy(self, hierarchy: FormattingType, _info):
-        return hierarchy.value
+    def set_content(self, content: str):
+        self.content = content
+        self._html_bytes = None
 
     def delete(self, start_index: int, end_index: int):
-        self.content = self.content[:start_index] + self.content[end_index:]
+        # Empty ranges leave the content (and its cached HTML) untouched.
+        if start_index == end_index:
+            return
+        self.set_content(self.content[:start_index] + self.content[end_index:])
 
     def insert(self, text: str, index: int):
-        self.content = self.content[:index] + text + self.content[index:]
+        if not text:
+            return
+        self.set_content(self.content[:index] + text + self.content[index:])
 
     def switch_formatting(self, formatting_type: FormattingType):
-        if formatting_type == FormattingType.BOLD.value:
-            self.bold = not self.bold
-        elif formatting_type == FormattingType.ITALIC.value:
-            self.italic = not self.italic
-        elif formatting_type == FormattingType.LOWERSCRIPT.value:
-            self.lowerscript = not self.lowerscript
-        elif formatting_type == FormattingType.SUPERSCRIPT.value:
-            self.superscript = not self.superscript
+        self._html_bytes = None
+        # Returns members unchanged and still accepts the raw string value.
+        formatting_type = FormattingType(formatting_type)
+        flag = _TOGGLED_FLAGS.get(formatting_type)
+        if flag is None:
+            self.hierarchy = formatting_type
         else:
-            self.hierarchy = FormattingType(formatting_type)
+            setattr(self, flag, not getattr(self, flag))
 
     def to_html(self) -> str:
-        logging.info(f"Processing content: {self.content}")
+        # html.escape's chained str.replace calls beat a str.translate table
+        # here: translate slows down sharply whenever it has to expand a char.
         text = html.escape(self.content)
-        text = re.sub(r"\n+", "<br>", text)
-        if self.bold:
-            text = f"<b>{text}</b>"
-        if self.italic:
-            text = f"<i>{text}</i>"
-        if self.lowerscript:
-            text = f"<sub>{text}</sub>"
-        if self.superscript:
-            text = f"<sup>{text}</sup>"
-
-        if self.hierarchy == FormattingType.TITLE:
-            text = f"<h1>{text}</h1>"
-        elif self.hierarchy == FormattingType.HEADING:
-            text = f"<h2>{text}</h2>"
-        elif self.hierarchy == FormattingType.SUBHEADING:
-            text = f"<h3>{text}</h3>"
-        return text
+        if "\n" in text:
+            text = _NEWLINES_RE.sub("<br>", text)
+        open_tags, close_tags = _TAG_PAIRS[self.hierarchy, self.format_mask]
+        return f"{open_tags}{text}{close_tags}"
+
+    def to_html_bytes(self) -> bytes:
+        if self._html_bytes is None:
+            self._html_bytes = self.to_html().encode("utf-8")
+        return self._html_bytes
 
     def can_merge_with(self, other: "Paragraph") -> bool:
         return (
@@ -74,4 +132,4 @@ class Paragraph(BaseModel):
         )
 
     def merge(self, other: "Paragraph"):
-        self.content += other.content
\ No newline at end of file
+        self.set_content(self.content + other.content)
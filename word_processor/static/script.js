@@ -4,7 +4,8 @@
         const chatInput = document.getElementById('chat-input');
         const chatSend = document.getElementById('chat-send');
 
-        let chatHistory = [];
+        // The server keeps the chat history; this id selects it.
+        const conversationId = Date.now().toString(36) + Math.random().toString(36).slice(2);
 
         async function refreshDocument() {
             const [jsonResponse, htmlResponse] = await Promise.all([
@@ -31,20 +32,46 @@
                 headers: {
                     'Content-Type': 'application/json'
                 },
-                body: JSON.stringify({ message: message, history: chatHistory })
+                body: JSON.stringify({ conversation_id: conversationId, message: message })
             });
 
-            const data = await response.json();
-            chatHistory.push({ role: 'user', content: message });
-            chatHistory.push(data.message);
+            // Errors come back as a plain JSON/text body, not an event stream.
+            if (!response.ok) {
+                const error = await response.text();
+                appendMessage('assistant', `Error ${response.status}: ${error}`);
+                return;
+            }
 
-            appendMessage('assistant', data.message.content);
+            // The reply arrives as server-sent events, one per text chunk.
+            const messageElement = appendMessage('assistant', '');
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let content = '';
+            while (true) {
+                const { done, value } = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, { stream: true });
+                const events = buffer.split('\n\n');
+                buffer = events.pop();
+                for (const event of events) {
+                    if (event.startsWith('data: ')) {
+                        content += JSON.parse(event.slice(6)).content;
+                        setMessage(messageElement, 'assistant', content);
+                    }
+                }
+            }
         }
 
         function appendMessage(role, content) {
             const messageElement = document.createElement('div');
-            messageElement.innerHTML = `<strong>${role}:</strong> ${content}`;
             chatContainer.appendChild(messageElement);
+            setMessage(messageElement, role, content);
+            return messageElement;
+        }
+
+        function setMessage(messageElement, role, content) {
+            messageElement.innerHTML = `<strong>${role}:</strong> ${content}`;
             chatContainer.scrollTop = chatContainer.scrollHeight;
         }
 
@@ -1,25 +1,39 @@
 import sys
+import logging
+import queue
+from collections import OrderedDict
+from logging.handlers import QueueHandler, QueueListener
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
-from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse
-from pydantic import BaseModel
+from fastapi.responses import (
+    HTMLResponse,
+    PlainTextResponse,
+    Response,
+    StreamingResponse,
+)
+from pydantic import BaseModel, ConfigDict, StringConstraints
 import uvicorn
-from typing import Any, Dict, List
+from typing import Annotated, Any, Dict, List
 import os
 import asyncio
+import orjson
 
 from word_processor.document import Document
 from word_processor.paragraph import Paragraph
 from word_processor.enums import FormattingType, MarginType
-from word_processor.gemini_client import GeminiAgentClient
+from word_processor.gemini_client import GeminiAgentClient, configure_logging
 
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.staticfiles import StaticFiles
 
+log = logging.getLogger(__name__)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
+    configure_logging()
     if sys.platform == "win32":
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
 
@@ -27,12 +41,42 @@ async def lifespan(app: FastAPI):
         server_url=os.getenv("SERVER_URL", "http://localhost:8000/mcp"),
         gemini_model="gemini-2.5-flash",
     )
+    # conversation_id -> message history, least recently used first.
+    app.state.chats = OrderedDict()
+    # Hand log records to a background thread so handler I/O never blocks
+    # the event loop.
+    root_logger = logging.getLogger()
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, *root_logger.handlers, respect_handler_level=True)
+    root_logger.handlers = [QueueHandler(log_queue)]
+    listener.start()
     yield
     # Shutdown
-    pass
+    listener.stop()
+    root_logger.handlers = list(listener.handlers)
+
+
+# Routes that answer with text/event-stream.
+EVENT_STREAM_PATHS = {"/chat"}
+
+
+class StreamSkippingGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves server-sent event streams alone.
+
+    Older Starlette releases gzip text/event-stream too, which buffers the
+    stream; the SSE routes bypass compression here regardless of version.
+    """
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in EVENT_STREAM_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
 
 
 app = FastAPI(lifespan=lifespan)
+# Document HTML/JSON compresses well; small replies are passed through as is.
+app.add_middleware(StreamSkippingGZipMiddleware, minimum_size=1024, compresslevel=5)
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
 static_files_dir = os.path.join(script_dir, "word_processor", "static")
@@ -42,16 +86,34 @@ index_html_path = os.path.join(
     script_dir,
     "word_processor/index.html",  # this is the correct file path. dont edit.
 )
+# index.html bytes, reloaded only when the file's mtime changes.
+index_html_cache = {"mtime": None, "body": b""}
+# Encoded /document and /document/html bodies, valid for one Document.version.
+# Keyed on the document's own edit counter rather than document_version, which
+# only the mutating endpoints bump.
+document_cache: Dict[str, Any] = {"version": -1}
 
 document_version = 0
-version_condition = asyncio.Condition()
+# Set, then replaced with a fresh event, on every edit. Long-polling clients
+# wait on whichever event is current, so no lock is needed to check or wake.
+version_changed = asyncio.Event()
+# Seconds a wait-for-change request is held before returning the same version.
+WAIT_FOR_CHANGE_TIMEOUT = 30
+# Chat histories kept in memory before the least recently used is dropped.
+MAX_CHAT_CONVERSATIONS = 128
+# User/assistant turn pairs kept per conversation; older turns are dropped so
+# neither memory nor the prompt re-sent to Gemini grows without bound.
+MAX_CHAT_TURNS = 50
+# Stored as the assistant turn when the model answered without any text (a
+# tool-only turn, say), so the user message still has a reply in the history.
+EMPTY_REPLY_PLACEHOLDER = "(no text reply)"
 
 
 async def increment_version():
-    global document_version
-    async with version_condition:
-        document_version += 1
-        version_condition.notify_all()
+    global document_version, version_changed
+    document_version += 1
+    version_changed.set()
+    version_changed = asyncio.Event()
 
 
 # Global document instance
@@ -68,52 +130,68 @@ doc.switch_formatting(start_index=10, end_index=16, formatting_type=FormattingTy
 # --- Request Models ---
 
 
-class DocumentRequest(BaseModel):
-    content: List[Paragraph]
+class RequestModel(BaseModel):
+    # Request bodies are read-only once parsed; unknown keys are dropped.
+    model_config = ConfigDict(extra="ignore", frozen=True)
+
+
+# A bare file name inside SAVES_DIR: no separators and no leading dot, so it
+# can't escape the directory.
+SaveFilename = Annotated[
+    str, StringConstraints(pattern=r"^[A-Za-z0-9_-][A-Za-z0-9._-]{0,254}$")
+]
 
 
 class FindResult(BaseModel):
     locations: List[tuple[int, int]]
 
 
-class FindRequest(BaseModel):
+class FindRequest(RequestModel):
     search_term: str
     start_index: int = 0
     end_index: int = -1
 
 
-class InsertStringRequest(BaseModel):
+class FindManyRequest(RequestModel):
+    search_terms: List[str]
+
+
+class FindManyResult(BaseModel):
+    locations: Dict[str, List[tuple[int, int]]]
+
+
+class InsertStringRequest(RequestModel):
     text: str
     index: int
 
 
-class SaveRequest(BaseModel):
-    filename: str
+class SaveRequest(RequestModel):
+    filename: SaveFilename
 
 
-class LoadRequest(BaseModel):
-    filename: str
+class LoadRequest(RequestModel):
+    filename: SaveFilename
 
 
-class SwitchFormattingRequest(BaseModel):
+class SwitchFormattingRequest(RequestModel):
     start_index: int
     end_index: int
     formatting_type: FormattingType
 
 
-class SetMarginRequest(BaseModel):
+class SetMarginRequest(RequestModel):
     margin_type: MarginType
     value_mm: int
 
 
-class DeleteRequest(BaseModel):
+class DeleteRequest(RequestModel):
     start_index: int
     end_index: int
 
 
-class ChatRequest(BaseModel):
+class ChatRequest(RequestModel):
+    conversation_id: str
     message: str
-    history: List[Dict[str, Any]]
 
 
 # --- Response Models ---
@@ -125,39 +203,106 @@ class MessageResponse(BaseModel):
 
 @app.get("/")
 def read_root():
-    print("Tool call: read_root")
-    return FileResponse(index_html_path)
+    log.debug("Tool call: read_root")
+    mtime = os.stat(index_html_path).st_mtime_ns
+    if index_html_cache["mtime"] != mtime:
+        with open(index_html_path, "rb") as f:
+            index_html_cache["body"] = f.read()
+        index_html_cache["mtime"] = mtime
+    return HTMLResponse(content=index_html_cache["body"])
 
 
 # --- Chat Endpoint ---
 @app.post("/chat")
 async def chat(req: ChatRequest):
-    messages = req.history
-    messages.append({"role": "user", "content": req.message})
-    response = await app.state.gemini_client._chat_with_llm(messages)
-    return response
+    # History is kept here rather than replayed by the client on every turn;
+    # only the MAX_CHAT_CONVERSATIONS most recently used ones are retained,
+    # each capped at its last MAX_CHAT_TURNS turns.
+    chats = app.state.chats
+    messages = chats.setdefault(req.conversation_id, [])
+    chats.move_to_end(req.conversation_id)
+    while len(chats) > MAX_CHAT_CONVERSATIONS:
+        chats.popitem(last=False)
+    user_message = {"role": "user", "content": req.message}
+
+    # Streamed as server-sent events, one per text chunk, so the reply shows
+    # up while the model (and its tool calls) are still running.
+    async def reply_events():
+        parts = []
+        try:
+            async for text in app.state.gemini_client._chat_with_llm_stream(
+                messages + [user_message]
+            ):
+                parts.append(text)
+                yield b"data: " + orjson.dumps({"content": text}) + b"\n\n"
+        finally:
+            # Runs once the model has been called (a client that disconnects
+            # before the stream starts never gets here). Store the turn with
+            # whatever reply was received, so the history never has a user
+            # message without an answer.
+            reply = "".join(parts) or EMPTY_REPLY_PLACEHOLDER
+            messages.append(user_message)
+            messages.append({"role": "assistant", "content": reply})
+            # Turns are stored in pairs, so trimming keeps them aligned.
+            del messages[: -2 * MAX_CHAT_TURNS]
+
+    return StreamingResponse(reply_events(), media_type="text/event-stream")
 
 
 # --- Document level endpoints ---
 
 
+def cached_document_bytes(key: str, render) -> bytes:
+    # Only call from async endpoints: on the event loop no edit can be
+    # half-applied while the body is rendered and stored under doc.version.
+    if document_cache["version"] != doc.version:
+        document_cache.clear()
+        document_cache["version"] = doc.version
+    body = document_cache.get(key)
+    if body is None:
+        body = document_cache[key] = render()
+    return body
+
+
 @app.get("/document", response_model=List[Paragraph])
-def get_document():
-    print("Tool call: get_document")
-    return doc.get_content()
+async def get_document():
+    log.debug("Tool call: get_document")
+    # Returning pre-encoded bytes skips FastAPI's per-request response
+    # validation and re-encoding.
+    return Response(
+        content=cached_document_bytes("json", doc.to_json_bytes),
+        media_type="application/json",
+    )
 
 
 @app.get("/document/html", response_class=HTMLResponse)
-def get_document_html():
-    print("Tool call: get_document_html")
-    return doc.to_html()
+async def get_document_html():
+    # Runs on the event loop, like every edit: rendering from a threadpool
+    # worker could cache a paragraph's old bytes after an edit cleared them.
+    log.debug("Tool call: get_document_html")
+    return HTMLResponse(content=cached_document_bytes("html", doc.to_html_bytes))
 
 
 @app.post("/document/find_in_body", response_model=FindResult)
-def find_in_body(req: FindRequest) -> FindResult:
-    print(f"Tool call: find_in_body with search_term='{req.search_term}'")
+async def find_in_body(req: FindRequest):
+    log.debug("Tool call: find_in_body with search_term='%s'", req.search_term)
+    if not req.search_term:
+        return Response(content=b'{"locations":[]}', media_type="application/json")
     locations = doc.find_in_body(req.search_term, req.start_index, req.end_index)
-    return FindResult(locations=locations)
+    # Locations are plain int tuples, so they are encoded directly rather
+    # than validated into FindResult first.
+    return Response(
+        content=orjson.dumps({"locations": locations}), media_type="application/json"
+    )
+
+
+@app.post("/document/find_many", response_model=FindManyResult)
+async def find_many(req: FindManyRequest):
+    log.debug("Tool call: find_many with search_terms=%s", req.search_terms)
+    return Response(
+        content=orjson.dumps({"locations": doc.find_many(req.search_terms)}),
+        media_type="application/json",
+    )
 
 
 @app.post("/document/insert_string", response_model=MessageResponse)
@@ -171,7 +316,7 @@ async def insert_object(req: InsertStringRequest) -> MessageResponse:
 
 
 @app.get("/document/text_only", response_class=PlainTextResponse)
-def get_text_only() -> str:
+async def get_text_only() -> str:
     try:
         return doc.get_text_only()
     except Exception as e:
@@ -190,8 +335,11 @@ async def delete_substring(req: DeleteRequest):
 
 @app.post("/format/switch", response_model=MessageResponse)
 async def switch_formatting(req: SwitchFormattingRequest):
-    print(
-        f"Tool call: switch_formatting for start_index={req.start_index}, end_index={req.end_index}, type={req.formatting_type.value}"
+    log.debug(
+        "Tool call: switch_formatting for start_index=%s, end_index=%s, type=%s",
+        req.start_index,
+        req.end_index,
+        req.formatting_type.value,
     )
     try:
         doc.switch_formatting(req.start_index, req.end_index, req.formatting_type)
@@ -205,9 +353,9 @@ async def switch_formatting(req: SwitchFormattingRequest):
 
 @app.post("/document/save", response_model=MessageResponse)
 async def save_document(req: SaveRequest):
-    print(f"Tool call: save_document with filename='{req.filename}'")
+    log.debug("Tool call: save_document with filename='%s'", req.filename)
     try:
-        doc.save(req.filename, SAVES_DIR)
+        await doc.save(req.filename, SAVES_DIR)
         await increment_version()
         return MessageResponse(message=f"Document saved to {req.filename}.")
     except Exception as e:
@@ -216,9 +364,9 @@ async def save_document(req: SaveRequest):
 
 @app.post("/document/load", response_model=MessageResponse)
 async def load_document(req: LoadRequest):
-    print(f"Tool call: load_document with filename='{req.filename}'")
+    log.debug("Tool call: load_document with filename='%s'", req.filename)
     try:
-        doc.load(req.filename, SAVES_DIR)
+        await doc.load(req.filename, SAVES_DIR)
         await increment_version()
         return MessageResponse(message=f"Document loaded from {req.filename}.")
     except FileNotFoundError as e:
@@ -246,12 +394,17 @@ async def get_document_version():
 
 @app.get("/document/wait-for-change/{client_version}")
 async def wait_for_change(client_version: int):
-    async with version_condition:
-        if client_version < document_version:
-            return {"version": document_version}
-        await version_condition.wait()
+    if client_version < document_version:
         return {"version": document_version}
+    try:
+        await asyncio.wait_for(version_changed.wait(), WAIT_FOR_CHANGE_TIMEOUT)
+    except asyncio.TimeoutError:
+        pass
+    return {"version": document_version}
 
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # The document lives in this process's memory, so the server must run as
+    # a single worker. uvicorn's default "auto" loop and HTTP settings pick
+    # uvloop and httptools when they are installed (uvicorn[standard]).
+    uvicorn.run(app, host="0.0.0.0", port=8001, workers=1)